@@ -2,12 +2,15 @@
 import streamlit as st
 import os
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+import numpy as np
 import pandas as pd
 import re
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font, Border, Side, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Border, Side, Alignment, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
 from openpyxl.utils import get_column_letter
 
 # --- Page config (single call) ---
@@ -16,6 +19,341 @@ st.set_page_config(
     layout="wide",
 )
 
+
+# =========================================================
+# Helpers
+# =========================================================
+# columns every SPD / LTL sheet must have under the row-11 header
+REQUIRED_COLS = ["UPC", "Box X", "Sku Units"]
+
+# box dimensions are written as LxWxH, e.g. "12.50X10.25X8.00"
+DIM_RE = re.compile(r"^(\d{1,3}\.\d{1,2})X(\d{1,3}\.\d{1,2})X(\d{1,3}\.\d{1,2})\s*$")
+
+# pivot quantities stay integers; zero cells display blank through the format
+ZERO_BLANK_FORMAT = "0;-0;;@"
+
+# float-read ".0" suffixes and stray "+" signs in LTL UPCs
+UPC_STRIP_RE = re.compile(r"\.0$|\+")
+
+# .xlsx workbooks are ZIP containers; legacy and password-protected .xls
+# files are OLE documents that openpyxl can't open
+XLSX_MAGIC = b"PK\x03\x04"
+
+# cell styling shared by the SPD and LTL workbooks
+THIN_BORDER = Border(
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+    bottom=Side(style="thin"),
+)
+CENTER_ALIGN = Alignment(horizontal="center", vertical="center")
+
+
+def extract_dims(df):
+    # every "LxWxH" string on the sheet, row by row, as an (n, 3) float frame;
+    # only text cells containing an "X" are run through the regex
+    text = df.select_dtypes(exclude="number")
+    candidates = [
+        text.iloc[:, i].astype(str).str.contains("X", regex=False).any()
+        for i in range(text.shape[1])
+    ]
+    cells = pd.Series(text.loc[:, candidates].to_numpy().ravel()).astype(str)
+    cells = cells[cells.str.contains("X", regex=False)]
+    return cells.str.extract(DIM_RE).dropna().astype(float)
+
+
+def strip_columns(df):
+    # header cells sometimes carry stray spaces; the labels are only rebuilt
+    # when one actually does, so clean sheets keep read_excel's Index as is
+    if not all(isinstance(c, str) and c == c.strip() for c in df.columns):
+        df.columns = df.columns.astype(str).str.strip()
+    return df
+
+
+def arrow_strings(series):
+    # pyarrow-backed strings keep the UPCs in one UTF-8 buffer instead of one
+    # Python object per row; plain object strings when pyarrow is missing
+    try:
+        return series.astype("string[pyarrow]")
+    except ImportError:
+        return series
+
+
+# the server process is shared by every session, so the parsed-upload caches
+# are bounded: a few full 100-file SPD batches, the last 20 LTL uploads
+@st.cache_data(show_spinner=False, max_entries=300)
+def read_spd_file(file_bytes):
+    # Pull everything the formatter needs from an SPD workbook: the box table
+    # (header on row 11), Customer PO (G5), Routing # (G6) and the bold
+    # weights in column G. The table comes from the Rust-backed calamine
+    # reader when it is installed; fonts are only visible to openpyxl, so
+    # column G is always walked in read-only mode.
+    # Cached on the raw bytes, so reruns and re-uploads skip the parse.
+    try:
+        df = strip_columns(
+            pd.read_excel(BytesIO(file_bytes), header=10, engine="calamine")
+        )
+    except ImportError:
+        df = None
+
+    wb = load_workbook(
+        BytesIO(file_bytes), read_only=True, data_only=True, keep_links=False
+    )
+    try:
+        ws_data = wb.worksheets[0]
+        # read-only rows stop at the stored <dimension>, which can be stale
+        ws_data.reset_dimensions()
+        if df is None:
+            rows = [list(r) for r in ws_data.iter_rows(min_row=11, values_only=True)]
+            width = max((len(r) for r in rows), default=0)
+            rows = [r + [None] * (width - len(r)) for r in rows]
+            header = rows[0] if rows else []
+            df = pd.DataFrame(
+                rows[1:],
+                columns=[
+                    f"Unnamed: {i}" if h is None else str(h).strip()
+                    for i, h in enumerate(header)
+                ],
+            )
+
+        ws_meta = wb["Page1_1"] if "Page1_1" in wb.sheetnames else ws_data
+        if ws_meta is not ws_data:
+            ws_meta.reset_dimensions()
+
+        # Customer PO (G5), Routing # (G6) and the bold weights (the last
+        # bold cell is the total) all come from one walk down column G; each
+        # weight is kept only once the next one shows up, so the total drops out
+        customer_po, routing_number, weights = "", "", []
+        try:
+            prev = None
+            for row_idx, (cell,) in enumerate(
+                ws_meta.iter_rows(min_col=7, max_col=7), start=1
+            ):
+                if row_idx == 5:
+                    customer_po = cell.value or ""
+                elif row_idx == 6:
+                    routing_number = cell.value or ""
+                if getattr(cell.font, "bold", False) and cell.value is not None:
+                    if prev is not None:
+                        weights.append(prev)
+                    prev = cell.value
+        except Exception:
+            customer_po, routing_number, weights = "", "", []
+    finally:
+        wb.close()
+
+    return df, customer_po, routing_number, weights
+
+
+@st.cache_data(show_spinner=False, max_entries=20)
+def read_ltl_file(file_bytes):
+    # header row 11 (header=10); the Rust-backed calamine reader is much
+    # faster, openpyxl stays as the fallback
+    try:
+        df = pd.read_excel(BytesIO(file_bytes), header=10, engine="calamine")
+    except ImportError:
+        df = pd.read_excel(BytesIO(file_bytes), header=10, engine="openpyxl")
+    return strip_columns(df)
+
+
+@st.cache_data(show_spinner=False, max_entries=20)
+def format_ltl_file(file_bytes):
+    # the whole read/clean/pivot/style pipeline is keyed on the upload's
+    # bytes, so Streamlit reruns reuse the finished workbook
+    df = read_ltl_file(file_bytes)
+
+    # Box Contents
+    df_clean = df[REQUIRED_COLS].dropna(subset=["UPC", "Sku Units"]).copy()
+    # one combined strip pass, skipped when every UPC is already digits
+    upc = df_clean["UPC"].astype(str)
+    if not upc.str.isdigit().all():
+        upc = upc.str.replace(UPC_STRIP_RE, "", regex=True)
+    df_clean["UPC"] = arrow_strings(upc.str.zfill(12))
+    df_clean["Sku Units"] = (
+        pd.to_numeric(df_clean["Sku Units"], errors="coerce").fillna(0).astype(int)
+    )
+    df_clean.rename(columns={"Box X": "Box Number", "Sku Units": "Qty"}, inplace=True)
+
+    # Pivot Table
+    pivot_table = (
+        df_clean.groupby(["UPC", "Box Number"])["Qty"]
+        .sum()
+        .unstack(fill_value=0)
+        .reset_index()
+    )
+
+    # Totals
+    total_qty = int(df_clean["Qty"].sum()) if not df_clean.empty else 0
+    total_boxes = int(df_clean["Box Number"].nunique()) if not df_clean.empty else 0
+
+    # Extract Carton Weights
+    carton_weights = []
+    try:
+        wb_input = load_workbook(BytesIO(file_bytes), read_only=True, data_only=True)
+        try:
+            ws_page1 = (
+                wb_input["Page1_1"]
+                if "Page1_1" in wb_input.sheetnames
+                else wb_input[wb_input.sheetnames[0]]
+            )
+            # a stale stored <dimension> would cut the read-only walk short
+            ws_page1.reset_dimensions()
+            # read-only sheets have no iter_cols, so walk column G alone; the
+            # last bold weight is left out by appending each one a step behind
+            prev = None
+            for (cell,) in ws_page1.iter_rows(min_row=1, min_col=7, max_col=7):
+                if getattr(cell.font, "bold", False) and isinstance(
+                    cell.value, (int, float)
+                ):
+                    if prev is not None:
+                        carton_weights.append(prev)
+                    prev = cell.value
+        finally:
+            wb_input.close()
+    except Exception:
+        carton_weights = []
+
+    # Extract Dimensions
+    dims_found = extract_dims(df)
+
+    # Box Dimensions DataFrame
+    dim_df = pd.DataFrame()
+    if not dims_found.empty:
+        # one contiguous (n, 3) float block straight from the extract
+        dim_df = pd.DataFrame(
+            dims_found.to_numpy(), columns=["Length", "Width", "Height"]
+        )
+        dim_df.insert(0, "Box Number", range(1, len(dim_df) + 1))
+        weights_column = carton_weights[: len(dim_df)] + [""] * max(
+            0, len(dim_df) - len(carton_weights)
+        )
+        dim_df.insert(1, "Carton Weight", weights_column)
+
+    yellow_fill = PatternFill(
+        start_color="FFF2CC", end_color="FFF2CC", fill_type="solid"
+    )
+    header_font = Font(bold=True, size=14)
+
+    # named styles are registered once per workbook, so each cell takes
+    # a single style assignment instead of separate fill/font/border/
+    # alignment/number-format writes
+    named_styles = [
+        NamedStyle(
+            name="hdr",
+            font=header_font,
+            fill=yellow_fill,
+            border=THIN_BORDER,
+            alignment=CENTER_ALIGN,
+        ),
+        NamedStyle(
+            name="body",
+            font=DEFAULT_FONT,
+            border=THIN_BORDER,
+            alignment=CENTER_ALIGN,
+        ),
+        NamedStyle(
+            name="body_int",
+            font=DEFAULT_FONT,
+            border=THIN_BORDER,
+            alignment=CENTER_ALIGN,
+            number_format="0",
+        ),
+        NamedStyle(
+            name="body_dec",
+            font=DEFAULT_FONT,
+            border=THIN_BORDER,
+            alignment=CENTER_ALIGN,
+            number_format="0.00",
+        ),
+        NamedStyle(
+            name="body_qty",
+            font=DEFAULT_FONT,
+            border=THIN_BORDER,
+            alignment=CENTER_ALIGN,
+            number_format=ZERO_BLANK_FORMAT,
+        ),
+        NamedStyle(
+            name="total",
+            font=Font(bold=True),
+            border=THIN_BORDER,
+            alignment=CENTER_ALIGN,
+        ),
+    ]
+
+    # the sheets are streamed into a write-only workbook, one styled row at a
+    # time, so wide pivots never hold every cell object in memory
+    wb = Workbook(write_only=True)
+    for style in named_styles:
+        wb.add_named_style(style)
+
+    def styled(ws, value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    def sheet_rows(ws, df, number_style="body_int", force_int_cols=()):
+        # header row plus the body, numbers formatted per column; blanks are
+        # written as "" like pandas' to_excel did
+        rows = [[styled(ws, col, "hdr") for col in df.columns]]
+        col_styles = [
+            "body_int" if col_idx in force_int_cols else number_style
+            for col_idx in range(1, len(df.columns) + 1)
+        ]
+        values = df.astype(object).where(df.notna(), "")
+        for row in values.itertuples(index=False, name=None):
+            rows.append(
+                [
+                    styled(ws, v, num_style if isinstance(v, (int, float)) else "body")
+                    for v, num_style in zip(row, col_styles)
+                ]
+            )
+        return rows
+
+    def write_sheet(ws, rows, widths):
+        # write-only sheets emit their column widths before the first row
+        for col_idx, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
+        for row in rows:
+            ws.append(row)
+
+    # Box Contents, with the totals two rows below the table
+    ws = wb.create_sheet("Box Contents")
+    rows = sheet_rows(ws, df_clean)
+    rows += [
+        [],
+        [styled(ws, "Total Qty:", "total"), styled(ws, total_qty, "total")],
+        [styled(ws, "Total Boxes:", "total"), styled(ws, total_boxes, "total")],
+    ]
+    write_sheet(ws, rows, [18] * len(df_clean.columns))
+
+    # Pivot Table, box columns at a quarter of the usual width
+    ws = wb.create_sheet("Pivot Table")
+    write_sheet(
+        ws,
+        sheet_rows(ws, pivot_table, number_style="body_qty"),
+        [25] + [18 / 4] * (len(pivot_table.columns) - 1),
+    )
+
+    # Box Dimensions with the Total Carton Weight (+35) row
+    if not dim_df.empty:
+        ws = wb.create_sheet("Box Dimensions")
+        total_weight = (
+            sum(w for w in dim_df["Carton Weight"] if isinstance(w, (int, float))) + 35
+        )
+        rows = sheet_rows(ws, dim_df, number_style="body_dec", force_int_cols=[1])
+        rows.append(
+            [
+                styled(ws, "Total Carton Weight (+35):", "total"),
+                styled(ws, total_weight, "total"),
+            ]
+        )
+        write_sheet(ws, rows, [30] + [18] * (len(dim_df.columns) - 1))
+
+    formatted_output = BytesIO()
+    wb.save(formatted_output)
+    return formatted_output.getvalue()
+
+
 # =========================================================
 # SECTION 1: Excel Finder + ZIP Extractor (Cloud uploads only)
 # =========================================================
@@ -52,31 +390,27 @@ if search_btn:
         else:
             for f in uploaded_files_finder:
                 fname = f.name
-                try:
-                    fbytes = f.read()
-                except Exception as e:
-                    st.warning(f"⚠️ Could not read file {fname}: {e}")
-                    continue
-
                 fname_lower = fname.lower()
                 # Direct Excel file match
                 if fname_lower.endswith(excel_ext) and any(
                     p in fname_lower for p in patterns
                 ):
-                    found_files.append((fname, fbytes))
-                # ZIP: inspect inside
+                    try:
+                        found_files.append((fname, f.read()))
+                    except Exception as e:
+                        st.warning(f"⚠️ Could not read file {fname}: {e}")
+                # ZIP: inspect inside (only matching members are decompressed)
                 elif fname_lower.endswith(".zip"):
                     try:
-                        with zipfile.ZipFile(BytesIO(fbytes)) as z:
-                            for zi in z.namelist():
-                                zi_lower = zi.lower()
+                        with zipfile.ZipFile(f) as z:
+                            for zi in z.infolist():
+                                zi_lower = zi.filename.lower()
                                 if zi_lower.endswith(excel_ext) and any(
                                     p in zi_lower for p in patterns
                                 ):
                                     extracted = z.read(zi)
-                                    arcname = (
-                                        f"{fname.split('.')[0]}_{zi.split('/')[-1]}"
-                                    )
+                                    member_name = zi.filename.split("/")[-1]
+                                    arcname = f"{fname.split('.')[0]}_{member_name}"
                                     found_files.append((arcname, extracted))
                     except zipfile.BadZipFile:
                         st.warning(f"⚠️ Cannot read ZIP file: {fname}")
@@ -88,11 +422,17 @@ if search_btn:
             for ff in found_files:
                 st.write(f"🗂️ {ff[0]}")
 
-            # prepare zip for download
+            # prepare zip for download; .xlsx/.xlsm are already deflated
+            # containers, so only legacy .xls members are worth compressing
             zip_buffer = BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_out:
+            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as zip_out:
                 for arcname, data in found_files:
-                    zip_out.writestr(arcname, data)
+                    compress_type = (
+                        zipfile.ZIP_DEFLATED
+                        if arcname.lower().endswith(".xls")
+                        else zipfile.ZIP_STORED
+                    )
+                    zip_out.writestr(arcname, data, compress_type=compress_type)
             zip_buffer.seek(0)
             st.download_button(
                 "📦 Download ZIP of Matches",
@@ -130,26 +470,37 @@ if uploaded_files_formatter:
     # extract excel files from uploaded files
     for uploaded_file in uploaded_files_formatter:
         file_name = uploaded_file.name
-        try:
-            file_bytes = uploaded_file.read()
-        except Exception as e:
-            st.warning(f"⚠️ Cannot read {file_name}: {e}")
-            continue
 
         if file_name.lower().endswith((".xlsx", ".xls")):
-            all_files_to_process.append((file_name, BytesIO(file_bytes)))
+            try:
+                file_bytes = uploaded_file.getvalue()
+            except Exception as e:
+                st.warning(f"⚠️ Cannot read {file_name}: {e}")
+                continue
+            if not file_bytes.startswith(XLSX_MAGIC):
+                st.warning(f"⚠️ {file_name} is not an .xlsx workbook, skipped")
+                continue
+            all_files_to_process.append((file_name, file_bytes))
         elif file_name.lower().endswith(".zip"):
+            # the upload is already an in-memory file, so open the archive on
+            # it directly instead of copying it into another buffer first;
+            # only the Excel members are pulled out, once each, and kept
+            # only when their first bytes show an .xlsx container
             try:
-                with zipfile.ZipFile(BytesIO(file_bytes)) as z:
+                with zipfile.ZipFile(uploaded_file) as z:
                     for zip_item in z.namelist():
                         if zip_item.lower().endswith((".xlsx", ".xls")):
                             extracted_bytes = z.read(zip_item)
+                            if not extracted_bytes.startswith(XLSX_MAGIC):
+                                st.warning(
+                                    f"⚠️ {zip_item} in {file_name} is not an"
+                                    " .xlsx workbook, skipped"
+                                )
+                                continue
                             arcname = (
                                 f"{file_name.split('.')[0]}_{zip_item.split('/')[-1]}"
                             )
-                            all_files_to_process.append(
-                                (arcname, BytesIO(extracted_bytes))
-                            )
+                            all_files_to_process.append((arcname, extracted_bytes))
             except zipfile.BadZipFile:
                 st.warning(f"⚠️ Cannot read ZIP file: {file_name}")
 
@@ -160,135 +511,81 @@ if uploaded_files_formatter:
             # processing variables
             consolidated_contents = []
             consolidated_dims = []
-            box_offset = 0
-
-            for fname, fbytes in all_files_to_process:
-                try:
-                    fbytes.seek(0)
-                except:
-                    pass
+            summary_pairs = []
+
+            # parse the workbooks concurrently (the dominant cost); the
+            # per-file pandas work below runs in upload order
+            with ThreadPoolExecutor(
+                max_workers=min(8, len(all_files_to_process))
+            ) as pool:
+                parsed = [
+                    pool.submit(read_spd_file, fbytes)
+                    for _, fbytes in all_files_to_process
+                ]
 
+            for (fname, _), future in zip(all_files_to_process, parsed):
                 try:
-                    df = pd.read_excel(fbytes, header=10, engine="openpyxl")
-                    df.columns = df.columns.astype(str).str.strip()
+                    df, customer_po, routing_number, weights = future.result()
                 except Exception as e:
                     st.warning(f"⚠️ Error reading file {fname}: {e}")
                     continue
 
-                required_columns = ["UPC", "Box X", "Sku Units"]
-                missing_cols = [c for c in required_columns if c not in df.columns]
+                missing_cols = [c for c in REQUIRED_COLS if c not in df.columns]
                 if missing_cols:
                     st.warning(f"⚠️ File {fname} missing: {', '.join(missing_cols)}")
                     continue
 
-                # extract customer PO and routing # from Page1_1 or first sheet
-                try:
-                    fbytes.seek(0)
-                    wb_temp = load_workbook(fbytes, data_only=True)
-                    ws_temp = (
-                        wb_temp["Page1_1"]
-                        if "Page1_1" in wb_temp.sheetnames
-                        else wb_temp[wb_temp.sheetnames[0]]
-                    )
-                    customer_po = ws_temp["G5"].value or ""
-                    routing_number = ws_temp["G6"].value or ""
-                except Exception:
-                    customer_po, routing_number = "", ""
-
                 # --- Box Contents processing ---
-                df_clean = (
-                    df[required_columns].dropna(subset=["UPC", "Sku Units"]).copy()
-                )
-                df_clean["UPC"] = (
-                    df_clean["UPC"]
-                    .astype(str)
-                    .str.replace(r"\.0$", "", regex=True)
-                    .str.zfill(12)
-                )
+                df_clean = df[REQUIRED_COLS].dropna(subset=["UPC", "Sku Units"]).copy()
+                # the trailing ".0" only shows up on float columns, so strip it
+                # through an integer cast there and as a plain suffix (no
+                # regex) for mixed columns
+                upc = df_clean["UPC"]
+                if pd.api.types.is_integer_dtype(upc):
+                    upc = upc.astype(str)
+                elif pd.api.types.is_float_dtype(upc) and (upc % 1 == 0).all():
+                    upc = upc.astype("Int64").astype(str)
+                else:
+                    upc = upc.astype(str).str.removesuffix(".0")
+                df_clean["UPC"] = arrow_strings(upc.str.zfill(12))
                 df_clean["Sku Units"] = (
                     pd.to_numeric(df_clean["Sku Units"], errors="coerce")
                     .fillna(0)
-                    .astype(int)
+                    .astype("int32")
                 )
                 df_clean.rename(
                     columns={"Box X": "Box Number", "Sku Units": "Qty"}, inplace=True
                 )
 
-                if len(df_clean) > 0:
-                    # offset Box Number so boxes from different files don't collide
-                    df_clean["Box Number"] = (
-                        df_clean["Box Number"].astype(int) + box_offset
-                    )
-                    box_offset = df_clean["Box Number"].max()
-
                 df_clean["Customer PO"] = customer_po
                 df_clean["Routing #"] = routing_number
                 consolidated_contents.append(df_clean)
+                if len(df_clean) > 0:
+                    # each file contributes one (PO, Routing #) pair to the Summary
+                    summary_pairs.append((customer_po, routing_number))
 
                 # --- Dimensions extraction ---
-                dimension_pattern = (
-                    r"\b\d{1,3}\.\d{1,2}X\d{1,3}\.\d{1,2}X\d{1,3}\.\d{1,2}\b"
-                )
-                dimension_data = []
-                for _, row in df.iterrows():
-                    for col in df.columns:
-                        val = str(row[col])
-                        if re.match(dimension_pattern, val):
-                            try:
-                                length, width, height = val.split("X")
-                                dimension_data.append(
-                                    (float(length), float(width), float(height))
-                                )
-                            except:
-                                pass
-
-                # --- Weight extraction (attempt to get bold cells in column G) ---
-                try:
-                    fbytes.seek(0)
-                    wb_temp2 = load_workbook(fbytes, data_only=True)
-                    ws_for_bold = (
-                        wb_temp2["Page1_1"]
-                        if "Page1_1" in wb_temp2.sheetnames
-                        else wb_temp2[wb_temp2.sheetnames[0]]
+                dims_found = extract_dims(df)
+
+                # only the first box per Routing # survives into All Box
+                # Dimensions, so each file contributes at most that one row;
+                # its Box Number is assigned after the routings are ordered
+                if len(weights) or len(dims_found) or len(df_clean):
+                    length, width, height = (
+                        dims_found.iloc[0].tolist()
+                        if not dims_found.empty
+                        else ["", "", ""]
                     )
-                    bold_cells = [
-                        cell
-                        for cell in ws_for_bold["G"]
-                        if getattr(cell.font, "bold", False) and cell.value is not None
-                    ]
-                    if bold_cells:
-                        bold_cells = bold_cells[:-1]
-                    weights = [cell.value for cell in bold_cells]
-                except Exception:
-                    weights = []
-
-                num_boxes = max(len(weights), len(dimension_data), len(df_clean))
-                start_box_num = (
-                    box_offset - len(df_clean) + 1
-                    if len(df_clean) > 0
-                    else box_offset + 1
-                )
-                boxes = list(range(start_box_num, start_box_num + num_boxes))
-
-                lengths, widths, heights = (
-                    zip(*dimension_data) if dimension_data else ([], [], [])
-                )
-                lengths = list(lengths) + [""] * (num_boxes - len(lengths))
-                widths = list(widths) + [""] * (num_boxes - len(widths))
-                heights = list(heights) + [""] * (num_boxes - len(heights))
-                weights = list(weights) + [""] * (num_boxes - len(weights))
-
-                df_dims = pd.DataFrame(
-                    {
-                        "Box Number": boxes,
-                        "Weight": weights,
-                        "Length": lengths,
-                        "Width": widths,
-                        "Height": heights,
-                        "Routing #": routing_number,
-                    }
-                )
-                consolidated_dims.append(df_dims)
+                    df_dims = pd.DataFrame(
+                        {
+                            "Weight": [weights[0] if weights else ""],
+                            "Length": [length],
+                            "Width": [width],
+                            "Height": [height],
+                            "Routing #": [routing_number],
+                        }
+                    )
+                    consolidated_dims.append(df_dims)
 
             # --- Final assembly ---
             try:
@@ -300,38 +597,26 @@ if uploaded_files_formatter:
             except ValueError:
                 final_contents = pd.DataFrame()
 
-            col_order = ["UPC", "Box Number", "Qty", "Customer PO", "Routing #"]
             if not final_contents.empty:
-                final_contents = final_contents[
-                    [c for c in col_order if c in final_contents.columns]
-                    + [c for c in final_contents.columns if c not in col_order]
-                ]
-                final_contents = final_contents.sort_values(
-                    by="Customer PO", ascending=True
-                ).reset_index(drop=True)
+                # sort by Customer PO, keeping upload order within a PO
+                final_contents = final_contents.astype(
+                    {"Customer PO": "category"}
+                ).sort_values("Customer PO", kind="stable", ignore_index=True)
 
                 # Reassign Box Number based on Routing # groups
+                # (groups are numbered in order of first appearance)
                 routing_series = final_contents["Routing #"].fillna("").astype(str)
-                routing_to_group = {}
-                group_list = []
-                group_counter = 1
-                for r in routing_series:
-                    if r not in routing_to_group:
-                        routing_to_group[r] = group_counter
-                        group_counter += 1
-                    group_list.append(routing_to_group[r])
-                final_contents["Box Number"] = group_list
-                final_contents["Box Number"] = final_contents["Box Number"].astype(int)
-
-                # reorder to ensure Box Number is second column
-                cols = list(final_contents.columns)
-                if "Box Number" in cols:
-                    cols.insert(1, cols.pop(cols.index("Box Number")))
-                    final_contents = final_contents[cols]
-
-                summary_df = final_contents[
-                    ["Customer PO", "Routing #"]
-                ].drop_duplicates(ignore_index=True)
+                codes, _ = pd.factorize(routing_series, sort=False)
+                final_contents["Box Number"] = (codes + 1).astype("int32")
+
+                # the Summary is built from the per-file pairs in the same PO
+                # order as the contents, instead of hashing every contents row
+                summary_df = (
+                    pd.DataFrame(summary_pairs, columns=["Customer PO", "Routing #"])
+                    .drop_duplicates()
+                    .astype({"Customer PO": "category"})
+                    .sort_values("Customer PO", kind="stable", ignore_index=True)
+                )
             else:
                 summary_df = pd.DataFrame()
                 final_contents = pd.DataFrame()
@@ -342,47 +627,36 @@ if uploaded_files_formatter:
                 else pd.DataFrame()
             )
             if not final_dims.empty:
+                # one row per routing, in Summary order, renumbered once
                 final_dims = final_dims.dropna(
                     subset=["Weight", "Length", "Width", "Height"], how="any"
-                ).reset_index(drop=True)
-                final_dims = final_dims.drop_duplicates(
-                    subset=["Routing #"], keep="first"
-                ).reset_index(drop=True)
+                ).drop_duplicates(subset=["Routing #"], keep="first")
 
+                # a routing listed under more than one PO is placed by its
+                # first Summary row, matching the keep="first" above
                 summary_routing_order = (
-                    summary_df["Routing #"].tolist() if not summary_df.empty else []
+                    list(dict.fromkeys(summary_df["Routing #"].tolist()))
+                    if not summary_df.empty
+                    else []
                 )
-                if summary_routing_order:
-                    final_dims["Routing #"] = pd.Categorical(
-                        final_dims["Routing #"],
-                        categories=summary_routing_order,
-                        ordered=True,
-                    )
-                    final_dims = final_dims.sort_values("Routing #").reset_index(
-                        drop=True
+                if (
+                    summary_routing_order
+                    and final_dims["Routing #"].tolist() != summary_routing_order
+                ):
+                    # sort on each routing's Summary position; routings the
+                    # Summary doesn't list keep their value and go last
+                    position = {r: i for i, r in enumerate(summary_routing_order)}
+                    final_dims = final_dims.sort_values(
+                        "Routing #", key=lambda s: s.map(position), kind="stable"
                     )
-                final_dims["Box Number"] = range(1, len(final_dims) + 1)
+                final_dims = final_dims.reset_index(drop=True)
+                final_dims.insert(
+                    0, "Box Number", np.arange(1, len(final_dims) + 1, dtype=np.int32)
+                )
 
             # --- Write to Excel and style ---
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                if not final_contents.empty:
-                    final_contents.to_excel(
-                        writer, sheet_name="All Box Contents", index=False
-                    )
-                else:
-                    pd.DataFrame(
-                        columns=["UPC", "Box Number", "Qty", "Customer PO", "Routing #"]
-                    ).to_excel(writer, sheet_name="All Box Contents", index=False)
-
-                if not final_dims.empty:
-                    final_dims.to_excel(
-                        writer, sheet_name="All Box Dimensions", index=False
-                    )
-
-            output.seek(0)
-            wb = load_workbook(output)
-
+            # Rows are streamed into a write-only workbook with their styles
+            # already attached, so nothing has to be re-read or restyled later.
             header_fill = PatternFill(
                 start_color="e3d3a8", end_color="e3d3a8", fill_type="solid"
             )
@@ -390,158 +664,208 @@ if uploaded_files_formatter:
                 start_color="e09ddf", end_color="e09ddf", fill_type="solid"
             )
             bold_font = Font(bold=True)
-            thin_border = Border(
-                left=Side(style="thin"),
-                right=Side(style="thin"),
-                top=Side(style="thin"),
-                bottom=Side(style="thin"),
-            )
-            center_align = Alignment(horizontal="center", vertical="center")
 
-            # Style All Box Contents headers
-            ws = wb["All Box Contents"]
-            for cell in ws[1]:
-                cell.font = bold_font
-                cell.border = thin_border
-                cell.fill = special_fill if (cell.value == "Routing #") else header_fill
+            wb = Workbook(write_only=True)
+            # register every cell style once as a named style
+            for style in [
+                NamedStyle(name="body", font=DEFAULT_FONT, alignment=CENTER_ALIGN),
+                NamedStyle(
+                    name="body_qty",
+                    font=DEFAULT_FONT,
+                    alignment=CENTER_ALIGN,
+                    number_format=ZERO_BLANK_FORMAT,
+                ),
+                NamedStyle(
+                    name="hdr",
+                    font=bold_font,
+                    fill=header_fill,
+                    border=THIN_BORDER,
+                    alignment=CENTER_ALIGN,
+                ),
+                NamedStyle(
+                    name="hdr_routing",
+                    font=bold_font,
+                    fill=special_fill,
+                    border=THIN_BORDER,
+                    alignment=CENTER_ALIGN,
+                ),
+                NamedStyle(
+                    name="pivot_upc",
+                    font=bold_font,
+                    fill=header_fill,
+                    alignment=CENTER_ALIGN,
+                ),
+                NamedStyle(
+                    name="pivot_total",
+                    font=bold_font,
+                    fill=special_fill,
+                    alignment=CENTER_ALIGN,
+                ),
+            ]:
+                wb.add_named_style(style)
+
+            def out_cell(ws, value, style="body"):
+                # every written value is centered; blanks stay empty cells
+                if value is None:
+                    return None
+                cell = WriteOnlyCell(ws, value=value)
+                cell.style = style
+                return cell
+
+            def header_row(ws, columns):
+                return [
+                    out_cell(
+                        ws,
+                        col_name,
+                        "hdr_routing" if col_name == "Routing #" else "hdr",
+                    )
+                    for col_name in columns
+                ]
+
+            def body_rows(ws, df):
+                values = df.astype(object).where(df.notna(), None)
+                return [
+                    [out_cell(ws, v) for v in row]
+                    for row in values.itertuples(index=False, name=None)
+                ]
+
+            def value_widths(df):
+                # longest rendered value per column (header included), measured
+                # on the frame itself rather than cell by cell
+                lengths = (
+                    df.astype(object)
+                    .where(df.notna(), "")
+                    .astype(str)
+                    .apply(lambda s: s.str.len())
+                )
+                return [
+                    max(len(str(col)), int(n))
+                    for col, n in zip(df.columns, lengths.max().fillna(0))
+                ]
+
+            def write_rows(ws, rows, widths):
+                # write-only sheets emit their column widths before the first row
+                for col_idx, width in enumerate(widths, start=1):
+                    ws.column_dimensions[get_column_letter(col_idx)].width = max(
+                        width + 5, 12
+                    )
+                for row in rows:
+                    ws.append(row)
+
+            # All Box Contents
+            ws = wb.create_sheet("All Box Contents")
+            contents_columns = (
+                list(final_contents.columns)
+                if not final_contents.empty
+                else ["UPC", "Box Number", "Qty", "Customer PO", "Routing #"]
+            )
+            contents_rows = [header_row(ws, contents_columns)]
+            contents_rows += body_rows(ws, final_contents)
+            contents_widths = value_widths(
+                final_contents
+                if not final_contents.empty
+                else pd.DataFrame(columns=contents_columns)
+            )
 
             # create pivot if data exists
             if not final_contents.empty:
-                all_grouped = final_contents.groupby(
-                    ["UPC", "Box Number"], as_index=False
-                )["Qty"].sum()
-                final_pivot = pd.pivot_table(
-                    all_grouped,
-                    index="UPC",
-                    columns="Box Number",
-                    values="Qty",
-                    aggfunc="sum",
-                    fill_value=0,
+                # a plain groupby + unstack builds the same grid as pivot_table
+                # without its extra aggregation pass and intermediate frames
+                final_pivot = (
+                    final_contents.groupby(["UPC", "Box Number"])["Qty"]
+                    .sum()
+                    .unstack(fill_value=0)
                 )
-                final_pivot_display = final_pivot.replace(0, "")
-                pivot_for_sum = final_pivot.fillna(0).astype(int)
-                pivot_column_totals = pivot_for_sum.sum(axis=0)
-                pivot_row_totals = pivot_for_sum.sum(axis=1)
+                pivot_column_totals = final_pivot.sum(axis=0)
+                pivot_row_totals = final_pivot.sum(axis=1)
                 grand_total_value = pivot_row_totals.sum()
 
-                start_col = 10  # Column J
-                ws.cell(row=1, column=start_col, value="UPC").font = bold_font
-                ws.cell(row=1, column=start_col).fill = header_fill
-                for idx, col in enumerate(
-                    final_pivot_display.columns, start=start_col + 1
-                ):
-                    ws.cell(row=1, column=idx, value=f"Box {col}").font = bold_font
-                    ws.cell(row=1, column=idx).fill = header_fill
-                    ws.cell(row=1, column=idx).border = thin_border
-
-                for r_idx, (upc, row) in enumerate(
-                    final_pivot_display.iterrows(), start=2
-                ):
-                    ws.cell(row=r_idx, column=start_col, value=upc)
-                    for c_idx, value in enumerate(row.values, start=start_col + 1):
-                        ws.cell(row=r_idx, column=c_idx, value=value)
-
-                total_col_idx = start_col + len(final_pivot_display.columns) + 1
-                ws.cell(
-                    row=1, column=total_col_idx, value="Total per UPC"
-                ).font = bold_font
-                ws.cell(row=1, column=total_col_idx).fill = special_fill
-
-                for r_idx, total in enumerate(pivot_row_totals, start=2):
-                    ws.cell(row=r_idx, column=total_col_idx, value=total)
-
-                pivot_total_row = len(final_pivot_display) + 2
-                ws.cell(
-                    row=pivot_total_row, column=start_col, value="Total per Box"
-                ).font = bold_font
-                ws.cell(row=pivot_total_row, column=start_col).fill = special_fill
-
-                for idx, col in enumerate(
-                    final_pivot_display.columns, start=start_col + 1
+                pivot_rows = [
+                    [out_cell(ws, "UPC", "pivot_upc")]
+                    + [out_cell(ws, f"Box {col}", "hdr") for col in final_pivot.columns]
+                    + [out_cell(ws, "Total per UPC", "pivot_total")]
+                ]
+                # one tolist() pass gives the pivot rows as plain ints
+                for upc, values, total in zip(
+                    final_pivot.index,
+                    final_pivot.to_numpy().tolist(),
+                    pivot_row_totals.tolist(),
                 ):
-                    ws.cell(
-                        row=pivot_total_row, column=idx, value=pivot_column_totals[col]
+                    pivot_rows.append(
+                        [out_cell(ws, upc)]
+                        + [out_cell(ws, v, "body_qty") for v in values]
+                        + [out_cell(ws, total)]
                     )
+                pivot_rows.append(
+                    [out_cell(ws, "Total per Box", "pivot_total")]
+                    + [
+                        out_cell(ws, pivot_column_totals[col])
+                        for col in final_pivot.columns
+                    ]
+                    + [out_cell(ws, grand_total_value, "pivot_total")]
+                )
+
+                pivot_block = final_pivot.rename(columns=lambda c: f"Box {c}")
+                pivot_block["Total per UPC"] = pivot_row_totals
+                pivot_block.loc["Total per Box"] = [
+                    *pivot_column_totals,
+                    grand_total_value,
+                ]
 
-                ws.cell(
-                    row=pivot_total_row, column=total_col_idx, value=grand_total_value
-                ).font = bold_font
-                ws.cell(row=pivot_total_row, column=total_col_idx).fill = special_fill
+                # place the pivot beside the contents, starting at column J
+                start_col = 10
+                contents_widths += [0] * (start_col - 1 - len(contents_widths))
+                contents_widths += value_widths(pivot_block.reset_index())
+                for r_idx, pivot_row in enumerate(pivot_rows):
+                    if r_idx == len(contents_rows):
+                        contents_rows.append([])
+                    row = contents_rows[r_idx]
+                    row += [None] * (start_col - 1 - len(row)) + pivot_row
 
             # Check if Customer PO column D is alphabetically sorted
-            ws_contents = wb["All Box Contents"]
-            customer_po_values = []
-            for row in ws_contents.iter_rows(min_row=2, min_col=4, max_col=4):
-                value = row[0].value
-                if value not in [None, ""]:
-                    customer_po_values.append(str(value))
-
-            last_row = ws_contents.max_row
+            pos_sorted = True
+            if "Customer PO" in final_contents.columns:
+                customer_po_values = (
+                    final_contents["Customer PO"].dropna().astype(str).str.lower()
+                )
+                customer_po_values = customer_po_values[customer_po_values != ""]
+                pos_sorted = customer_po_values.is_monotonic_increasing
 
-            if customer_po_values == sorted(
-                customer_po_values, key=lambda x: x.lower()
-            ):
+            if pos_sorted:
                 status_text = "✔ POs are alphabetically arranged"
                 status_color = "92d050"
             else:
                 status_text = "❌ POs are NOT alphabetically arranged"
                 status_color = "ff0000"
 
-            status_cell = ws_contents.cell(
-                row=last_row + 2, column=4, value=status_text
-            )
+            # status goes two rows below the last used row, in column D
+            status_cell = WriteOnlyCell(ws, value=status_text)
             status_cell.font = Font(bold=True, color="000000")
             status_cell.fill = PatternFill(
                 start_color=status_color, end_color=status_color, fill_type="solid"
             )
-            status_cell.border = thin_border
-            status_cell.alignment = center_align
-
-            # Style All Box Dimensions if present
-            if "All Box Dimensions" in wb.sheetnames and not final_dims.empty:
-                ws_dims = wb["All Box Dimensions"]
-                for cell in ws_dims[1]:
-                    cell.font = bold_font
-                    cell.border = thin_border
-                    cell.fill = (
-                        special_fill if (cell.value == "Routing #") else header_fill
-                    )
+            status_cell.border = THIN_BORDER
+            status_cell.alignment = CENTER_ALIGN
+            contents_rows += [[], [None, None, None, status_cell]]
+            contents_widths[3] = max(contents_widths[3], len(status_text))
+            write_rows(ws, contents_rows, contents_widths)
 
-            # Create summary sheet
-            ws_summary = wb.create_sheet(title="Summary", index=2)
-            for idx, col_name in enumerate(summary_df.columns, start=1):
-                cell = ws_summary.cell(row=1, column=idx, value=col_name)
-                cell.font = bold_font
-                cell.border = thin_border
-                cell.fill = special_fill if col_name == "Routing #" else header_fill
+            # All Box Dimensions if present
+            if not final_dims.empty:
+                ws_dims = wb.create_sheet("All Box Dimensions")
+                write_rows(
+                    ws_dims,
+                    [header_row(ws_dims, final_dims.columns)]
+                    + body_rows(ws_dims, final_dims),
+                    value_widths(final_dims),
+                )
 
-            for r_idx, row in enumerate(
-                dataframe_to_rows(summary_df, index=False, header=False), start=2
-            ):
-                for c_idx, value in enumerate(row, start=1):
-                    ws_summary.cell(row=r_idx, column=c_idx, value=value)
-
-            # Center align and set column widths
-            for ws_iter in wb.worksheets:
-                for row in ws_iter.iter_rows():
-                    for cell in row:
-                        cell.alignment = center_align
-                        if cell.border is None:
-                            cell.border = thin_border
-                for col in ws_iter.columns:
-                    try:
-                        max_len = max(
-                            len(str(cell.value)) if cell.value is not None else 0
-                            for cell in col
-                        )
-                    except Exception:
-                        max_len = 0
-                    try:
-                        ws_iter.column_dimensions[col[0].column_letter].width = max(
-                            max_len + 5, 12
-                        )
-                    except Exception:
-                        pass
+            # Summary sheet
+            ws_summary = wb.create_sheet("Summary")
+            summary_rows = body_rows(ws_summary, summary_df)
+            if len(summary_df.columns):
+                summary_rows.insert(0, header_row(ws_summary, summary_df.columns))
+            write_rows(ws_summary, summary_rows, value_widths(summary_df))
 
             # Save and provide download
             final_output = BytesIO()
@@ -576,232 +900,30 @@ uploaded_file_single = st.file_uploader(
 )
 
 if uploaded_file_single:
-    try:
-        input_filename = uploaded_file_single.name
-        base_name, ext = os.path.splitext(input_filename)
-        output_filename = f"{base_name} formatted{ext}"
+    input_filename = uploaded_file_single.name
+    base_name = os.path.splitext(input_filename)[0]
+    # the formatted workbook is always written as .xlsx
+    output_filename = f"{base_name} formatted.xlsx"
+    file_bytes = uploaded_file_single.getvalue()
 
-        # Read with header row 11 (header=10)
-        df = pd.read_excel(uploaded_file_single, header=10, engine="openpyxl")
-        df.columns = df.columns.astype(str).str.strip()
+    try:
+        # the carton weights are read with openpyxl, which can't open
+        # legacy or password-protected .xls files
+        if not file_bytes.startswith(XLSX_MAGIC):
+            raise ValueError(f"{input_filename} is not an .xlsx workbook")
+        df = read_ltl_file(file_bytes)
     except Exception as e:
         st.error(f"❌ Error reading Excel file: {e}")
     else:
-        required_columns = ["UPC", "Box X", "Sku Units"]
-        missing_cols = [c for c in required_columns if c not in df.columns]
+        missing_cols = [c for c in REQUIRED_COLS if c not in df.columns]
 
         if missing_cols:
             st.warning(f"⚠️ Missing columns: {', '.join(missing_cols)}")
         else:
-            # Box Contents
-            df_clean = df[required_columns].dropna(subset=["UPC", "Sku Units"]).copy()
-            df_clean["UPC"] = (
-                df_clean["UPC"]
-                .astype(str)
-                .str.replace(r"\.0$", "", regex=True)
-                .str.replace("+", "", regex=False)
-                .str.zfill(12)
-            )
-            df_clean["Sku Units"] = (
-                pd.to_numeric(df_clean["Sku Units"], errors="coerce")
-                .fillna(0)
-                .astype(int)
-            )
-            df_clean.rename(
-                columns={"Box X": "Box Number", "Sku Units": "Qty"}, inplace=True
-            )
-
-            # Pivot Table
-            pivot_table = pd.pivot_table(
-                df_clean,
-                index="UPC",
-                columns="Box Number",
-                values="Qty",
-                aggfunc="sum",
-                fill_value=0,
-            ).reset_index()
-            pivot_table = pivot_table.replace(0, "")
-
-            # Totals
-            total_qty = int(df_clean["Qty"].sum()) if not df_clean.empty else 0
-            total_boxes = (
-                int(df_clean["Box Number"].nunique()) if not df_clean.empty else 0
-            )
-
-            # Extract Carton Weights
-            carton_weights = []
-            try:
-                # load workbook directly from uploaded file-like
-                uploaded_file_single.seek(0)
-                wb_input = load_workbook(uploaded_file_single, data_only=True)
-                ws_page1 = (
-                    wb_input["Page1_1"]
-                    if "Page1_1" in wb_input.sheetnames
-                    else wb_input[wb_input.sheetnames[0]]
-                )
-                for row in ws_page1.iter_rows(min_row=1, max_col=7):
-                    cell = row[6]  # column G (index 6)
-                    if getattr(cell.font, "bold", False) and isinstance(
-                        cell.value, (int, float)
-                    ):
-                        carton_weights.append(cell.value)
-                if carton_weights:
-                    carton_weights = carton_weights[:-1]
-            except Exception:
-                carton_weights = []
-
-            total_carton_weight = sum(
-                [w for w in carton_weights if isinstance(w, (int, float))]
-            )
-            total_carton_weight_plus35 = total_carton_weight + 35
-
-            # Extract Dimensions
-            dimension_pattern = (
-                r"\b\d{1,3}\.\d{1,2}X\d{1,3}\.\d{1,2}X\d{1,3}\.\d{1,2}\b"
-            )
-            dimension_data = []
-            for _, row in df.iterrows():
-                for col in df.columns:
-                    val = str(row[col])
-                    if re.match(dimension_pattern, val):
-                        try:
-                            length, width, height = val.split("X")
-                            dimension_data.append(
-                                (float(length), float(width), float(height))
-                            )
-                        except:
-                            pass
-
-            # Box Dimensions DataFrame
-            dim_df = pd.DataFrame()
-            if dimension_data:
-                dim_df = pd.DataFrame(
-                    dimension_data, columns=["Length", "Width", "Height"]
-                )
-                dim_df.insert(0, "Box Number", range(1, len(dim_df) + 1))
-                weights_column = carton_weights[: len(dim_df)] + [""] * max(
-                    0, len(dim_df) - len(carton_weights)
-                )
-                dim_df.insert(1, "Carton Weight", weights_column)
-
-            # Write to Excel
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                df_clean.to_excel(writer, sheet_name="Box Contents", index=False)
-                pivot_table.to_excel(writer, sheet_name="Pivot Table", index=False)
-                if not dim_df.empty:
-                    dim_df.to_excel(writer, sheet_name="Box Dimensions", index=False)
-
-            output.seek(0)
-            wb = load_workbook(output)
-
-            yellow_fill = PatternFill(
-                start_color="FFF2CC", end_color="FFF2CC", fill_type="solid"
-            )
-            header_font = Font(bold=True, size=14)
-            align_center = Alignment(horizontal="center", vertical="center")
-            thin_border = Border(
-                left=Side(style="thin"),
-                right=Side(style="thin"),
-                top=Side(style="thin"),
-                bottom=Side(style="thin"),
-            )
-
-            def style_sheet(ws, keep_decimals=False, force_int_cols=[]):
-                # header row style
-                for row in ws.iter_rows(min_row=1, max_row=1):
-                    for cell in row:
-                        cell.fill = yellow_fill
-                        cell.font = header_font
-                        cell.alignment = align_center
-                        cell.border = thin_border
-                # body rows
-                for row in ws.iter_rows(
-                    min_row=2, max_row=ws.max_row, max_col=ws.max_column
-                ):
-                    for col_idx, cell in enumerate(row, start=1):
-                        cell.border = thin_border
-                        cell.alignment = align_center
-                        if isinstance(cell.value, (int, float)):
-                            if col_idx in force_int_cols:
-                                cell.number_format = "0"
-                            elif keep_decimals:
-                                cell.number_format = "0.00"
-                            else:
-                                cell.number_format = "0"
-                # column widths
-                for col_idx in range(1, ws.max_column + 1):
-                    ws.column_dimensions[get_column_letter(col_idx)].width = 18
-
-            # Apply formatting
-            for sheet_name in wb.sheetnames:
-                ws = wb[sheet_name]
-                if sheet_name == "Box Dimensions":
-                    style_sheet(ws, keep_decimals=True, force_int_cols=[1])
-                elif sheet_name == "Pivot Table":
-                    style_sheet(ws, keep_decimals=False)
-                    # Reduce width to 1/4 excluding UPC
-                    for col_idx in range(2, ws.max_column + 1):
-                        try:
-                            current_width = ws.column_dimensions[
-                                get_column_letter(col_idx)
-                            ].width
-                            ws.column_dimensions[
-                                get_column_letter(col_idx)
-                            ].width = max(4, (current_width or 18) / 4)
-                        except Exception:
-                            ws.column_dimensions[get_column_letter(col_idx)].width = 4
-                    ws.column_dimensions["A"].width = 25
-                else:
-                    style_sheet(ws, keep_decimals=False)
-
-            # Totals for Box Contents
-            ws_contents = wb["Box Contents"]
-            total_row = ws_contents.max_row + 2
-            ws_contents[f"A{total_row}"] = "Total Qty:"
-            ws_contents[f"B{total_row}"] = total_qty
-            ws_contents[f"A{total_row + 1}"] = "Total Boxes:"
-            ws_contents[f"B{total_row + 1}"] = total_boxes
-            for r in range(total_row, total_row + 2):
-                for c in range(1, 3):
-                    cell = ws_contents.cell(row=r, column=c)
-                    cell.font = Font(bold=True)
-                    cell.border = thin_border
-                    cell.alignment = align_center
-
-            # Total Carton Weight in Box Dimensions
-            if "Box Dimensions" in wb.sheetnames:
-                ws_dim = wb["Box Dimensions"]
-                carton_col = 2
-                last_row = ws_dim.max_row
-                total_weight = sum(
-                    [
-                        ws_dim.cell(row=r, column=carton_col).value
-                        for r in range(2, last_row + 1)
-                        if isinstance(
-                            ws_dim.cell(row=r, column=carton_col).value, (int, float)
-                        )
-                    ]
-                )
-                total_weight += 35
-                total_row = last_row + 1
-                ws_dim.cell(row=total_row, column=1, value="Total Carton Weight (+35):")
-                ws_dim.cell(row=total_row, column=carton_col, value=total_weight)
-                for col in [1, carton_col]:
-                    cell = ws_dim.cell(row=total_row, column=col)
-                    cell.font = Font(bold=True)
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                    cell.border = thin_border
-                ws_dim.column_dimensions["A"].width = 30
-
-            formatted_output = BytesIO()
-            wb.save(formatted_output)
-            formatted_output.seek(0)
-
             # Streamlit Download
             st.download_button(
                 label=f"💾 Download {output_filename}",
-                data=formatted_output,
+                data=format_ltl_file(file_bytes),
                 file_name=output_filename,
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )